@@ -0,0 +1,15 @@
+function taps = ffeToFIR(weights, ffe)
+% ffeToFIR converts the weights trained by a comm.LinearEqualizer (see
+% makeFFE) into FIR taps for the fixed-weight (isa(dfe, 'double')) branch of
+% processQAM.
+%
+% The equalizer output is w'*u, so the taps are conjugated for use with
+% filter().  The equalizer output lags its input by ReferenceTap-1 symbols,
+% while the fixed-weight branch of processQAM looks ahead by NumTaps+1.  The
+% difference is a whole number of symbols, which processQAM removes when it
+% re-syncs the equalized samples to the frame header.
+    taps = conj(weights(:));
+    if numel(taps) ~= ffe.NumTaps
+        error("ffeToFIR: expected %i weights, got %i.", ffe.NumTaps, numel(taps));
+    end
+end
@@ -0,0 +1,10 @@
+function dfe = makeDFE(M)
+% makeDFE builds the decision-feedback equalizer handed to processQAM when
+% the equalizer is to be trained.  makeQAMfiles.m and makeFFE.m take their
+% equalizer settings from here.
+    dfe = comm.DecisionFeedbackEqualizer('Algorithm','LMS', ...
+    'NumForwardTaps',4,'NumFeedbackTaps',3,'StepSize',0.03);
+    dfe.ReferenceTap = 4;
+    dfe.Constellation = qammod((1:M)-1, M) + 1j*eps;
+    dfe.WeightUpdatePeriod = 1000;
+end
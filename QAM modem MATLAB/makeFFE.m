@@ -0,0 +1,13 @@
+function ffe = makeFFE(M)
+% makeFFE builds a linear (feed-forward only) equalizer using the forward
+% section of makeDFE.  With no feedback taps, its trained weights map
+% directly onto the fixed-weight branch of processQAM (see ffeToFIR), so
+% captures processed with cached weights see the same equalizer as the
+% capture that trained them.
+    dfe = makeDFE(M);
+    ffe = comm.LinearEqualizer('Algorithm',dfe.Algorithm, ...
+    'NumTaps',dfe.NumForwardTaps,'StepSize',dfe.StepSize);
+    ffe.ReferenceTap = dfe.ReferenceTap;
+    ffe.Constellation = dfe.Constellation;
+    ffe.WeightUpdatePeriod = dfe.WeightUpdatePeriod;
+end
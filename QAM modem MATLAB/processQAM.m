@@ -367,7 +367,7 @@ if isa(dfe, 'double')
         samples = circshift(filter((dfe),1,samples), -numel(dfe)); % Has padding on both ends.
         samples = samples((numel(dfe)+1):(end-numel(dfe)));  %Remove the padding
     end
-elseif isa(dfe, 'comm.DecisionFeedbackEqualizer')
+elseif isa(dfe, 'comm.DecisionFeedbackEqualizer') || isa(dfe, 'comm.LinearEqualizer')
     samples = samples/mean(abs(samples));
     [samples, err, weights] = dfe(samples(:), header_samp);
 
@@ -315,11 +315,9 @@ if decode_on
     dfe.WeightUpdatePeriod = 1000;
     %}
 
-    dfe = comm.DecisionFeedbackEqualizer('Algorithm','LMS', ...
-    'NumForwardTaps',4,'NumFeedbackTaps',3,'StepSize',0.03);
-    dfe.ReferenceTap = 4;
-    dfe.Constellation = qammod((1:M)-1, M) + 1j*eps;
-    dfe.WeightUpdatePeriod = 1000;
+    % Equalizer settings live in makeDFE.m (QAM modem MATLAB) so they stay
+    % in step with the equalizer trained by waveform_analysis.py.
+    dfe = makeDFE(M);
 
 
 %{
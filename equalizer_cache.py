@@ -0,0 +1,110 @@
+"""
+This module caches equalizer weights trained by processQAM so they can be
+reused across captures of the same link.  It has no MATLAB dependency.
+"""
+
+import statistics
+import threading
+
+
+class EqualizerCache:
+    """
+    Stores trained equalizer weights so that the (slow) adaptive equalizer
+    training only has to run once per link configuration.  Entries are keyed by
+    the waveform parameters and the test series the capture belongs to.
+
+    Each entry keeps the SNR and SER of the training run as its baseline.  If a
+    capture processed with the cached weights falls too far below that
+    baseline, the equalizer is retrained.  A retrain only replaces the weights
+    if it beats them.  If retrain_limit retrains fail to, the link itself has
+    changed, and the baseline moves to the median of those retrains.
+
+    An entry whose weights is None has been rejected: the cached weights could
+    not reproduce the trained result, so every capture is trained instead.
+
+    A single cache may be shared between several WaveformProcessor instances
+    running on different threads.  Only one thread trains a key at a time:
+    claim() and claim_retrain() mark a training run as in progress, and the
+    caller must release() the key when it is done, whether or not training
+    succeeded.
+    """
+
+    def __init__(self, snr_threshold=3.0, ser_threshold=1e-3, retrain_limit=3):
+        # Retrain if SNR_est drops more than snr_threshold dB below baseline,
+        # or if SER rises more than ser_threshold above baseline.
+        self.snr_threshold = snr_threshold
+        self.ser_threshold = ser_threshold
+        # Number of retrains that fail to beat the cached weights before the
+        # baseline is moved.
+        self.retrain_limit = retrain_limit
+        self._entries = {}
+        self._training = set()
+        self._lock = threading.Condition()
+
+    @staticmethod
+    def make_key(mod_order, block_length, sym_rate, rcf_rolloff, fc, series=None):
+        return (mod_order, block_length, sym_rate, rcf_rolloff, fc, series)
+
+    def claim(self, key):
+        """
+        Returns the entry for key.  If there is none, marks key as being
+        trained and returns None; the caller must then train and release()
+        the key.  While another thread is doing the first training run for
+        key, blocks until it finishes.
+        """
+        with self._lock:
+            while True:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return entry
+                if key not in self._training:
+                    self._training.add(key)
+                    return None
+                self._lock.wait()
+
+    def claim_retrain(self, key, entry):
+        """
+        Marks key as being retrained if it still holds entry and no other
+        thread is training it.  Returns True if the caller should retrain (and
+        then release() the key).
+        """
+        with self._lock:
+            if key in self._training or self._entries.get(key) is not entry:
+                return False
+            self._training.add(key)
+            return True
+
+    def release(self, key):
+        """Ends the training run for key started by claim() or claim_retrain()."""
+        with self._lock:
+            self._training.discard(key)
+            self._lock.notify_all()
+
+    def store(self, key, weights, snr, ser):
+        with self._lock:
+            self._entries[key] = {"weights": weights, "snr": snr, "ser": ser, "missed": []}
+
+    def reject(self, key):
+        self.store(key, None, None, None)
+
+    def record_missed_retrain(self, key, entry, snr, ser):
+        """
+        Records a retrain (snr, ser) that did not beat entry's weights.  After
+        retrain_limit of these, the baseline moves to their median.
+        Does nothing if key no longer holds entry.
+        """
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return
+            missed = entry["missed"] + [(snr, ser)]
+            if len(missed) < self.retrain_limit:
+                self._entries[key] = {**entry, "missed": missed}
+            else:
+                self._entries[key] = {"weights": entry["weights"],
+                                      "snr": statistics.median(m[0] for m in missed),
+                                      "ser": statistics.median(m[1] for m in missed),
+                                      "missed": []}
+
+    def is_degraded(self, ref_snr, ref_ser, snr, ser):
+        """True if (snr, ser) is worse than (ref_snr, ref_ser) by more than the thresholds."""
+        return (snr < ref_snr - self.snr_threshold) or (ser > ref_ser + self.ser_threshold)
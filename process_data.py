@@ -8,6 +8,7 @@ import re
 from time import perf_counter as time
 import pandas
 import twister_api.fileio as fileio
+from equalizer_cache import EqualizerCache
 from waveform_analysis import WaveformProcessor
 
 import queue
@@ -25,6 +26,9 @@ output_file = os.path.join(r"C:\Users\kstreck\Desktop", "cable_test_long_v2_eq_r
 
 all_data = {}
 
+# Equalizer weights are trained once per waveform/series and shared between workers.
+eq_cache = EqualizerCache(snr_threshold=3.0, ser_threshold=1e-3)
+
 
 # The queue for tasks
 q = queue.Queue()
@@ -40,16 +44,18 @@ def worker():
         while proc is None:
             proc = proc_q.get()
         root, file = os.path.split(filepath)
+        # The test series is the subdirectory of waveform_dir holding the capture.
+        series = os.path.relpath(root, waveform_dir)
 
         sourcefile = '_'.join(file.split('_')[:4]) + ".mat"
         sourcepath = os.path.join(original_waveform_dir, sourcefile)
 
         proc.load_qam_waveform(sourcepath)
         samp_rate, samp_count, samples = fileio.load_waveform(filepath)
-        SNR_raw, SNR_est, nbits, biterr, nsyms, symerr = proc.process_qam(samp_rate, samples)
+        SNR_raw, SNR_est, nbits, biterr, nsyms, symerr, eq_mode = proc.process_qam(samp_rate, samples, series=series)
 
         # This could be unsafe with multithreaded processes?!?  Check this!
-        all_data.update({str(file) : (SNR_raw, SNR_est, nbits, biterr, nsyms, symerr)})
+        all_data.update({os.path.relpath(filepath, waveform_dir) : (SNR_raw, SNR_est, nbits, biterr, nsyms, symerr, eq_mode)})
 
         proc_q.put(proc)
         #print(q.qsize())
@@ -62,7 +68,7 @@ def start_workers(worker_pool=4):
         t = threading.Thread(target=worker)
         t.start()
         threads.append(t)
-        proc_q.put(WaveformProcessor(debug=True))
+        proc_q.put(WaveformProcessor(debug=True, eq_cache=eq_cache))
     return threads
 
 
@@ -82,14 +88,16 @@ def create_queue(task_items):
 def main():
     start = time()
     # loop through each test series in the root directory
-    #series_names = next(os.walk(waveform_dir))[1]
-    # Get the paths to every directory rooted in the "waveform_dir" folder
-    #series_paths = [os.path.join(waveform_dir, dir) for dir in series_names if os.listdir(os.path.join(waveform_dir, dir))]
+    series_names = next(os.walk(waveform_dir))[1]
+    # Get the paths to every directory rooted in the "waveform_dir" folder.
+    # Captures sitting directly in "waveform_dir" are treated as one series.
+    series_paths = [waveform_dir] + [os.path.join(waveform_dir, dir) for dir in series_names if os.listdir(os.path.join(waveform_dir, dir))]
 
     # Create a list of all the files we want to process.
     # NOTE: This will choke if there are any non-waveform filetypes in the directory.
     # TODO:  Add a filter to solve this problem.
-    list_of_files = [os.path.join(waveform_dir, file) for file in os.listdir(waveform_dir)]
+    list_of_files = [os.path.join(path, file) for path in series_paths for file in os.listdir(path)
+                     if os.path.isfile(os.path.join(path, file))]
 
     # Start up the workers
     # Creating the queue before the workers lets them get started as soon as they're created.
@@ -104,7 +112,7 @@ def main():
     stop_workers(workers)
 
     # Print the results to file
-    headerlist = ["SNR_raw", "SNR_est", "nbits", "biterr", "nsyms", "symerr"]
+    headerlist = ["SNR_raw", "SNR_est", "nbits", "biterr", "nsyms", "symerr", "eq"]
     pandas.DataFrame.from_dict(data=all_data, orient='index').to_csv(output_file, header=headerlist)
     end = time()
     print(f"processing test data took: {end - start:.2f} seconds")
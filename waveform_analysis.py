@@ -19,9 +19,11 @@ import matlab.engine
 
 
 class WaveformProcessor:
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, eq_cache=None):
         self.debug = debug
         self.diagnostics = True
+        # Optional EqualizerCache.  If None, processQAM6 is called as it always has been.
+        self.eq_cache = eq_cache
 
         print("Initializing MATLAB engine")
         start = time()
@@ -62,8 +64,108 @@ class WaveformProcessor:
 
 
 
-    def process_qam(self, samp_rate, captured_samples):
-        """Returns: (SNR_raw, SNR_est, nbits, biterr, nsyms, symerr)"""
+    @staticmethod
+    def _symbol_error_rate(nsym, errors):
+        # A capture that yields no symbols counts as a total failure.
+        if nsym == 0:
+            return 1.0
+        return errors["sym"] / nsym
+
+
+
+    def _run_qam(self, args, dfe):
+        """
+        Runs processQAM6 on args (everything before diagnostics_on) with the
+        given equalizer argument.
+
+        Returns: dict of nsym, errors, SNR_est, SNR_raw, SER and weights
+        """
+        data, nsym, errors, SNR_est, SNR_raw, weights = self.eng.processQAM6(*args, False, dfe, nargout=6)
+        return {"nsym": nsym, "errors": errors, "SNR_est": SNR_est, "SNR_raw": SNR_raw,
+                "SER": self._symbol_error_rate(nsym, errors), "weights": weights}
+
+
+
+    @staticmethod
+    def _is_better(a, b):
+        # Fewer symbol errors wins; SNR breaks ties.
+        if a["SER"] != b["SER"]:
+            return a["SER"] < b["SER"]
+        return a["SNR_est"] > b["SNR_est"]
+
+
+
+    def _train_equalizer(self, args, mod_order):
+        """
+        Processes the capture with a freshly built linear equalizer (see
+        makeFFE.m) and converts the trained weights to FIR taps (see ffeToFIR.m).
+
+        Returns: (result, taps)
+        """
+        ffe = self.eng.makeFFE(mod_order, nargout=1)
+        result = self._run_qam(args, ffe)
+        weights = result["weights"]
+        if isinstance(weights, (int, float, complex)) or math.prod(weights.size) <= 1:
+            raise RuntimeError(f"processQAM6 returned no equalizer weights for {self.filename}. "
+                               "It must accept a comm.LinearEqualizer as its dfe argument.")
+        taps = self.eng.ffeToFIR(weights, ffe, nargout=1)
+        return result, taps
+
+
+
+    def _update_cache(self, eq_key, args, trained, taps, entry=None, cached=None):
+        """
+        Decides which weights the cache should hold after a training run.
+
+        The new taps are run on the same capture as a fixed filter.  They are
+        only usable if that reproduces the trained result within the cache
+        thresholds.  When retraining, entry is the existing cache entry and
+        cached is the result its weights gave on this capture; the old weights
+        stay usable if they are also within the thresholds of the new training.
+        The better of the usable weights is kept, with the trained result as
+        the baseline.  If neither is usable, the key is rejected.
+        """
+        fixed = self._run_qam(args, taps)
+        if self.debug:
+            print(f"Trained SNR {trained['SNR_est']} dB, SER {trained['SER']}; "
+                  f"as fixed filter SNR {fixed['SNR_est']} dB, SER {fixed['SER']}")
+
+        candidates = []
+        if not self.eq_cache.is_degraded(trained["SNR_est"], trained["SER"], fixed["SNR_est"], fixed["SER"]):
+            candidates.append((fixed, taps))
+        if entry is not None and not self.eq_cache.is_degraded(trained["SNR_est"], trained["SER"],
+                                                               cached["SNR_est"], cached["SER"]):
+            candidates.append((cached, entry["weights"]))
+
+        if not candidates:
+            if self.debug:
+                print("Fixed equalizer weights do not reproduce the trained result; not caching")
+            self.eq_cache.reject(eq_key)
+            return
+
+        best, weights = candidates[0]
+        for result, candidate_weights in candidates[1:]:
+            if self._is_better(result, best):
+                best, weights = result, candidate_weights
+
+        if entry is not None and weights is entry["weights"] and not self._is_better(trained, cached):
+            # The retrain did not beat the cached weights; keep the entry as is.
+            self.eq_cache.record_missed_retrain(eq_key, entry, trained["SNR_est"], trained["SER"])
+            return
+        self.eq_cache.store(eq_key, weights, trained["SNR_est"], trained["SER"])
+
+
+
+    def process_qam(self, samp_rate, captured_samples, series=None):
+        """
+        series: optional test series name.  When an equalizer cache is in use,
+        weights are only reused between captures of the same series.
+
+        eq_mode is "trained" if the result came from a trained equalizer,
+        "cached" if it came from cached weights, and "none" without a cache.
+
+        Returns: (SNR_raw, SNR_est, nbits, biterr, nsyms, symerr, eq_mode)
+        """
 
         start = time()
         if self.debug:
@@ -87,9 +189,56 @@ class WaveformProcessor:
         #                                              sym2drop, rcf_rolloff, original_samples, samp_rate, 
         #                                              captured_samples, self.diagnostics, False, nargout=5)
 
-        data, nsym, errors, SNR_est, SNR_raw, weights = self.eng.processQAM6(mod_order, block_length, symbol_rate, if_estimate,
-                                                      rcf_rolloff, original_samples, samp_rate, 
-                                                      captured_samples, False, True, nargout=6)
+        args = (mod_order, block_length, symbol_rate, if_estimate, rcf_rolloff,
+                original_samples, samp_rate, captured_samples)
+
+        if self.eq_cache is None:
+            result = self._run_qam(args, True)
+            eq_mode = "none"
+        else:
+            eq_key = self.eq_cache.make_key(self.mod_order, self.block_length, self.sym_rate,
+                                            self.rcf_rolloff, self.if_estimate, series)
+            entry = self.eq_cache.claim(eq_key)
+
+            if entry is None:
+                # Nothing cached yet; this thread does the training run.
+                try:
+                    result, taps = self._train_equalizer(args, mod_order)
+                    self._update_cache(eq_key, args, result, taps)
+                finally:
+                    self.eq_cache.release(eq_key)
+                eq_mode = "trained"
+            elif entry["weights"] is None:
+                # The cache was rejected for this key; train every capture.
+                result, taps = self._train_equalizer(args, mod_order)
+                eq_mode = "trained"
+            else:
+                # Apply the cached weights as a fixed FIR instead of training.
+                if self.debug:
+                    print("Using cached equalizer weights")
+                result = self._run_qam(args, entry["weights"])
+                eq_mode = "cached"
+                # Another thread may already be retraining this key, in which
+                # case its result will replace the entry.
+                if self.eq_cache.is_degraded(entry["snr"], entry["ser"], result["SNR_est"], result["SER"]) \
+                        and self.eq_cache.claim_retrain(eq_key, entry):
+                    if self.debug:
+                        print("Link degraded beyond threshold, retraining equalizer")
+                    try:
+                        trained, taps = self._train_equalizer(args, mod_order)
+                        self._update_cache(eq_key, args, trained, taps, entry, result)
+                    finally:
+                        self.eq_cache.release(eq_key)
+                    # Report whichever of the two runs did better on this capture.
+                    if self._is_better(trained, result):
+                        result = trained
+                        eq_mode = "trained"
+
+        nsym = result["nsym"]
+        errors = result["errors"]
+        SNR_est = result["SNR_est"]
+        SNR_raw = result["SNR_raw"]
+        SER = result["SER"]
         end = time()
         if self.debug:
             print(f"Done. Took {end - start} seconds.")
@@ -101,9 +250,8 @@ class WaveformProcessor:
         # SER_theory = self.eng.erfc(math.sqrt(0.5 * (10 ** (SNR_est / 10)))) - (1 / 4) * (self.eng.erfc(math.sqrt(0.5 * (10 ** (SNR_est / 10))))) ** 2
 
         n_bit_errors = errors["bit"]
-        BER = n_bit_errors / (nsym * math.log2(self.mod_order))
+        BER = n_bit_errors / (nsym * math.log2(self.mod_order)) if nsym else 1.0
         n_sym_errors = errors["sym"]
-        SER = n_sym_errors / nsym
 
         if self.debug:
             print(f"\nAnalyzing {nsym} symbols:")
@@ -114,5 +262,5 @@ class WaveformProcessor:
             # For QPSK only:
             # print(f"Predicted QPSK SER is {SER_theory} ({round(SER_theory*nsym)} symbols)\n")
 
-        # SNR, nbits, biterr, nsyms, symerr
-        return (SNR_raw, SNR_est, (nsym * math.log2(self.mod_order)), n_bit_errors, nsym, n_sym_errors)
+        # SNR, nbits, biterr, nsyms, symerr, eq_mode
+        return (SNR_raw, SNR_est, (nsym * math.log2(self.mod_order)), n_bit_errors, nsym, n_sym_errors, eq_mode)